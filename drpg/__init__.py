@@ -1,4 +1,18 @@
-from drpg.sync import DrpgSync
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from drpg.sync import DrpgSync
 
 __all__ = ["DrpgSync"]
 __version__ = "2025.1.2.dev1"
+
+
+def __getattr__(name: str) -> Any:
+    # DrpgSync pulls in httpx, only import it when it is actually used
+    if name == "DrpgSync":
+        from drpg.sync import DrpgSync
+
+        return DrpgSync
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
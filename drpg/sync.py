@@ -3,12 +3,16 @@ from __future__ import annotations
 import functools
 import html
 import logging
+import queue
 import re
 import sqlite3
-from datetime import datetime, timedelta, timezone as dt_timezone
+import string
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime
 from hashlib import md5
-from multiprocessing.pool import ThreadPool
-from time import timezone # Keep this for the timedelta calculation, maybe rename later
+from operator import itemgetter
 from typing import TYPE_CHECKING, NamedTuple
 
 import httpx
@@ -17,6 +21,8 @@ from drpg.api import DrpgApi
 from drpg.custom_types import PrepareDownloadUrlResponse # Import this type
 
 if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterator
+    from concurrent.futures import Future
     from pathlib import Path
     from typing import Any, Callable
 
@@ -27,6 +33,7 @@ if TYPE_CHECKING:  # pragma: no cover
     Decorator = Callable[[NoneCallable], NoneCallable]
 
 logger = logging.getLogger("drpg")
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB
 
 # Define a structure for DB query results for type hinting
 class DbFileInfo(NamedTuple):
@@ -46,7 +53,7 @@ def suppress_errors(*errors: type[Exception]) -> Decorator:
             try:
                 return func(*args, **kwargs)
             except errors as e:
-                logger.exception(e)
+                logger.exception("Suppressed %s in %s", type(e).__name__, func.__name__)
 
         return wrapper
 
@@ -78,16 +85,100 @@ class DrpgSync:
     );
 
     CREATE INDEX IF NOT EXISTS idx_files_local_path ON files (local_path);
+
+    -- Lets the prefetch in _prefetch_db_file_info read everything from the index alone
+    CREATE INDEX IF NOT EXISTS idx_files_cover ON files (
+        product_id, item_id, api_last_modified, api_checksum,
+        local_path, local_last_synced, local_checksum
+    );
+    """
+    _DB_PRAGMAS = (
+        "PRAGMA journal_mode = WAL;",
+        "PRAGMA synchronous = NORMAL;",
+        "PRAGMA temp_store = MEMORY;",
+        "PRAGMA mmap_size = 268435456;",  # 256 MiB
+        "PRAGMA cache_size = -65536;",  # 64 MiB
+    )
+    _PRODUCT_UPSERT_SQL = """
+    INSERT INTO products (product_id, name, publisher_name, last_api_check)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(product_id) DO UPDATE SET
+        name = excluded.name,
+        publisher_name = excluded.publisher_name,
+        last_api_check = excluded.last_api_check;
+    """
+    _FILE_UPSERT_SQL = """
+    INSERT INTO files (
+        product_id, item_id, filename, api_last_modified, api_checksum,
+        local_path, local_last_synced, local_checksum
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(product_id, item_id) DO UPDATE SET
+        filename = excluded.filename,
+        api_last_modified = excluded.api_last_modified,
+        api_checksum = excluded.api_checksum,
+        local_path = excluded.local_path,
+        local_last_synced = excluded.local_last_synced,
+        local_checksum = excluded.local_checksum;
     """
+    # Joining against the keys, rather than filtering with "(product_id, item_id) IN
+    # (VALUES ...)", lets SQLite look each key up in idx_files_cover instead of scanning
+    _FILE_PREFETCH_SQL = """
+    SELECT f.product_id, f.item_id, f.api_last_modified, f.api_checksum,
+           f.local_path, f.local_last_synced, f.local_checksum
+    FROM (VALUES {values}) AS k
+    JOIN files AS f ON f.product_id = k.column1 AND f.item_id = k.column2
+    """
+    # Number of downloaded files written to the DB cache in one transaction
+    _FILE_ROWS_BATCH_SIZE = 500
+    # Keeps the number of bound parameters (2 per item) below SQLite's default limit of 999
+    _PREFETCH_BATCH_SIZE = 400
 
     def __init__(self, config: Config) -> None:
         self._config = config
         self._api = DrpgApi(config.token)
-        self._db_conn = sqlite3.connect(config.db_path, isolation_level=None) # Autocommit mode
-        self._db_conn.row_factory = sqlite3.Row # Access columns by name
-        self._db_conn.execute("PRAGMA foreign_keys = ON;")
+        # Shared by all download threads so connections to the CDN are pooled and reused
+        self._http = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            timeout=60.0,  # Slightly longer timeout for downloads
+            limits=httpx.Limits(
+                max_keepalive_connections=config.threads,
+                max_connections=config.threads * 2,
+                # Threads can wait a while for a download link to be prepared, keep idle
+                # connections (and the DNS lookups and TLS handshakes behind them) around
+                keepalive_expiry=60.0,
+            ),
+            headers={
+                "Accept-Encoding": "gzip, deflate, br",
+                "User-Agent": "Mozilla/5.0",
+                "Accept": "*/*",
+            },
+        )
+        self._db_conn = self._connect_db()
         self._setup_db()
-        self._touched_items = set() # Keep track of items seen in current API sync
+        self._touched_items: set[int] = set() # Keys of items seen in current API sync
+        self._db_cache: dict[int, DbFileInfo] = {} # Prefetched file metadata
+        self._file_rows: queue.Queue[tuple] = queue.Queue() # Rows from download threads
+        self._product_dirs: dict[int, Path] = {} # Normalized directory of each product
+        self._api_checksums: dict[int, str | None] = {} # Newest checksum per item
+        self._sync_started_iso = datetime.now(timezone.utc).isoformat()
+
+    def _connect_db(self) -> sqlite3.Connection:
+        """Open and tune a new database connection."""
+        # The object may be created on one thread and synced on another (e.g. the TUI worker)
+        db_conn = sqlite3.connect(
+            self._config.db_path,
+            isolation_level=None, # Autocommit mode
+            check_same_thread=False,
+            cached_statements=256, # Keep parsed statements around for the whole sync
+        )
+        db_conn.row_factory = sqlite3.Row # Access columns by name
+        db_conn.execute("PRAGMA foreign_keys = ON;")
+        # The database is only a cache that can be rebuilt from the API, so trading
+        # durability of the last transactions for write speed is fine
+        for pragma in self._DB_PRAGMAS:
+            db_conn.execute(pragma)
+        return db_conn
 
     def _setup_db(self) -> None:
         """Create database tables if they don't exist."""
@@ -101,33 +192,53 @@ class DrpgSync:
         self._api.token()
         logger.info("Fetching products list from API")
         self._touched_items.clear() # Reset for this sync run
+        self._product_dirs.clear()
+        self._api_checksums.clear()
+        # All rows written by this sync share one timestamp
+        self._sync_started_iso = datetime.now(timezone.utc).isoformat()
 
         # Prepare arguments for parallel processing
         process_item_args = []
+        product_rows = []
         try:
             for product in self._api.customer_products():
-                # Update product info in DB (or insert if new)
-                self._update_product_in_db(product)
+                product_rows.append(self._product_db_row(product))
+                self._product_dirs[product["orderProductId"]] = self._product_dir(product)
                 for item in product["files"]:
-                    item_key = (product["orderProductId"], item["index"])
+                    item_key = _item_key(product["orderProductId"], item["index"])
                     self._touched_items.add(item_key) # Mark as seen in API
+                    self._api_checksums[item_key] = _newest_checksum(item)
                     process_item_args.append((product, item))
         except Exception as e:
             logger.error("Failed to fetch products from API: %s", e, exc_info=True)
             self._close_db()
             return
 
-        logger.info("Checking %d items against local cache/filesystem", len(process_item_args))
-        # Use ThreadPool for downloading, but decisions are made sequentially before this
-        items_to_download = []
-        for product, item in process_item_args:
-            if self._need_download_db(product, item):
-                items_to_download.append((product, item))
+        # Update product info in DB (or insert if new), all in one transaction
+        self._update_products_in_db(product_rows)
 
-        logger.info("Found %d items requiring download/update.", len(items_to_download))
-        if items_to_download:
-            with ThreadPool(self._config.threads) as pool:
-                pool.starmap(self._process_item_db, items_to_download)
+        logger.info("Checking %d items against local cache/filesystem", len(process_item_args))
+        self._prefetch_db_file_info(list(self._touched_items))
+        try:
+            with ThreadPoolExecutor(self._config.threads) as executor:
+                # Decisions only read the prefetched cache and stat files, so run them in parallel
+                decisions = executor.map(
+                    lambda args: self._need_download_db(*args), process_item_args
+                )
+                items_to_download = [
+                    args for args, need_download in zip(process_item_args, decisions)
+                    if need_download
+                ]
+
+                logger.info("Found %d items requiring download/update.", len(items_to_download))
+                futures = {
+                    executor.submit(self._process_item_db, product, item): (product, item)
+                    for product, item in items_to_download
+                }
+                self._wait_for_downloads(executor, futures)
+        finally:
+            # Also keep what was downloaded when the sync is interrupted
+            self._save_file_rows()
 
         # Cleanup DB - remove items not seen in the API response
         self._cleanup_db()
@@ -135,42 +246,86 @@ class DrpgSync:
         self._close_db()
         logger.info("Sync finished!")
 
-    def _update_product_in_db(self, product: Product) -> None:
-        """Insert or update product information in the database."""
-        now = datetime.now(dt_timezone.utc).isoformat()
+    def _wait_for_downloads(
+        self,
+        executor: ThreadPoolExecutor,
+        futures: dict[Future[None], tuple[Product, DownloadItem]],
+    ) -> None:
+        """Report failed downloads and save finished ones while the rest are still running."""
+        try:
+            for future in as_completed(futures):
+                if error := future.exception():
+                    product, item = futures[future]
+                    logger.error(
+                        "Unexpected error processing %s - %s",
+                        product["name"], item["filename"], exc_info=error
+                    )
+                # Save finished items in batches while the other downloads are still running
+                if self._file_rows.qsize() >= self._FILE_ROWS_BATCH_SIZE:
+                    self._save_file_rows()
+        except BaseException:
+            # E.g. Ctrl+C, don't start the queued downloads (the pool would wait for them)
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Group statements into one explicit transaction (the connection autocommits)."""
+        self._db_conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._db_conn.execute("ROLLBACK")
+            raise
+        self._db_conn.execute("COMMIT")
+
+    def _product_db_row(self, product: Product) -> tuple:
+        """Build the products table row for a product."""
         publisher_name = product.get("publisher", {}).get("name")
-        with self._db_conn:
-            self._db_conn.execute(
-                """
-                INSERT INTO products (product_id, name, publisher_name, last_api_check)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(product_id) DO UPDATE SET
-                    name = excluded.name,
-                    publisher_name = excluded.publisher_name,
-                    last_api_check = excluded.last_api_check;
-                """,
-                (product["orderProductId"], product["name"], publisher_name, now),
-            )
+        return (product["orderProductId"], product["name"], publisher_name, self._sync_started_iso)
 
-    def _get_db_file_info(self, product_id: int, item_id: int) -> DbFileInfo | None:
-        """Fetch file metadata from the database."""
-        cursor = self._db_conn.execute(
-            """
-            SELECT api_last_modified, api_checksum, local_path, local_last_synced, local_checksum
-            FROM files
-            WHERE product_id = ? AND item_id = ?
-            """,
-            (product_id, item_id),
-        )
-        row = cursor.fetchone()
-        return DbFileInfo(*row) if row else None
+    def _update_products_in_db(self, rows: list[tuple]) -> None:
+        """Insert or update product information in the database."""
+        with self._transaction():
+            self._db_conn.executemany(self._PRODUCT_UPSERT_SQL, rows)
+
+    def _save_file_rows(self) -> None:
+        """Write file rows queued by the download threads to the database."""
+        rows = []
+        while True:
+            try:
+                rows.append(self._file_rows.get_nowait())
+            except queue.Empty:
+                break
+        if not rows:
+            return
+
+        with self._transaction():
+            self._db_conn.executemany(self._FILE_UPSERT_SQL, rows)
+        logger.debug("Updated DB cache for %d file(s)", len(rows))
+
+    def _prefetch_db_file_info(self, keys: list[int]) -> None:
+        """Load file metadata for all given item keys from the database."""
+        self._db_cache.clear()
+        batch_size = self._PREFETCH_BATCH_SIZE
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start : start + batch_size]
+            # One query per batch instead of one per item. All full batches share the same
+            # SQL text, so SQLite parses it once and reuses it from the statement cache.
+            values = ",".join("(?, ?)" for _ in batch)
+            cursor = self._db_conn.execute(
+                self._FILE_PREFETCH_SQL.format(values=values),
+                [value for key in batch for value in _split_item_key(key)],
+            )
+            for product_id, item_id, *file_info in cursor:
+                self._db_cache[_item_key(product_id, item_id)] = DbFileInfo(*file_info)
+        logger.debug("Prefetched %d cached file record(s) from DB", len(self._db_cache))
 
     def _need_download_db(self, product: Product, item: DownloadItem) -> bool:
         """Check DB cache and filesystem to determine if download is needed."""
         product_id = product["orderProductId"]
         item_id = item["index"]
-        expected_path = self._file_path(product, item)
-        db_info = self._get_db_file_info(product_id, item_id)
+        db_info = self._db_cache.get(_item_key(product_id, item_id))
 
         if not db_info:
             logger.debug(
@@ -179,14 +334,6 @@ class DrpgSync:
             )
             return True
 
-        # Check if path changed due to config
-        if str(expected_path) != db_info.local_path:
-             logger.debug(
-                "Needs download: %s - %s: Local path changed ('%s' vs '%s')",
-                product["name"], item["filename"], db_info.local_path, expected_path
-            )
-             return True
-
         # Check API modification time against DB cache
         api_mod_time_str = product["fileLastModified"]
         if api_mod_time_str != db_info.api_last_modified:
@@ -198,7 +345,7 @@ class DrpgSync:
 
         # Check checksum if enabled
         if self._config.use_checksums:
-            api_checksum = _newest_checksum(item)
+            api_checksum = self._api_checksum(product, item)
             if api_checksum != db_info.api_checksum:
                  logger.debug(
                     "Needs download: %s - %s: API checksum changed ('%s' vs '%s')",
@@ -209,6 +356,17 @@ class DrpgSync:
             # Could add a check here against path.exists() and local checksum if paranoid.
             # For performance, we trust the DB if checksums match.
 
+        # Cheap comparisons are done, only now build the path and touch the filesystem
+        expected_path = self._file_path(product, item)
+
+        # Check if path changed due to config
+        if str(expected_path) != db_info.local_path:
+             logger.debug(
+                "Needs download: %s - %s: Local path changed ('%s' vs '%s')",
+                product["name"], item["filename"], db_info.local_path, expected_path
+            )
+             return True
+
         # Fallback: Check if file actually exists at the cached path (maybe deleted manually)
         # This adds a stat call but prevents errors if DB is out of sync with reality.
         if not expected_path.exists():
@@ -246,83 +404,94 @@ class DrpgSync:
             )
             return # Don't update DB if we can't even get the URL
 
-        # 2. Download File
-        try:
-            file_response = httpx.get(
-                url_data["url"],
-                timeout=60.0, # Slightly longer timeout for downloads
-                follow_redirects=True,
-                headers={
-                    "Accept-Encoding": "gzip, deflate, br",
-                    "User-Agent": "Mozilla/5.0",
-                    "Accept": "*/*",
-                },
-            )
-            file_response.raise_for_status() # Raise exception for bad status codes
-            file_content = file_response.content
-        except httpx.HTTPStatusError as e:
-             logger.error(
-                "HTTP error downloading %s - %s: %s",
-                product["name"], item["filename"], e
-            )
-             return
-        except httpx.RequestError as e:
-            logger.error(
-                "Network error downloading %s - %s: %s",
-                product["name"], item["filename"], e
-            )
+        # 2. Download File, streaming it into a temporary file next to the target
+        part_path = path.with_name(path.name + ".part")
+        api_checksum = self._api_checksum(product, item)
+        # MD5 is only used to compare against the API's checksum, not for security
+        hasher = md5(usedforsecurity=False) if self._config.validate and api_checksum else None
+        db_info = self._db_cache.get(_item_key(product_id, item_id))
+        headers = _conditional_headers(db_info, path, api_checksum)
+        status_code = self._download_to_part(url_data["url"], part_path, headers, hasher)
+        if status_code is None:
+            return # Don't update DB if the download failed
+        if status_code == httpx.codes.NOT_MODIFIED:
+            logger.info("Not modified, keeping local file: %s", path)
+            # Only asked for when the local file's checksum matches the API's one
+            self._queue_file_row(product, item, path, api_checksum, api_checksum)
             return
 
         # 3. Validate Checksum (if enabled)
         local_checksum = None
-        api_checksum = _newest_checksum(item)
-        if self._config.validate and api_checksum:
-            local_checksum = md5(file_content).hexdigest()
+        if hasher:
+            local_checksum = hasher.hexdigest()
             if local_checksum != api_checksum:
                 logger.error(
                     "ERROR: Invalid checksum for %s - %s, skipping saving file (API: %s != Local: %s)",
                     product["name"], item["filename"], api_checksum, local_checksum
                 )
+                _remove_quietly(part_path)
                 # Do NOT update DB if checksum fails validation
                 return
             else:
                  logger.debug("Checksum validated for %s - %s", product["name"], item["filename"])
 
-        # 4. Write File
+        # 4. Move the complete file into place
         try:
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_bytes(file_content)
+            part_path.replace(path)
             logger.debug("Successfully wrote file: %s", path)
         except OSError as e:
             logger.error("Failed to write file %s: %s", path, e)
+            _remove_quietly(part_path)
             return # Don't update DB if write fails
 
-        # 5. Update Database
-        now_iso = datetime.now(dt_timezone.utc).isoformat()
+        # 5. Queue the Database update, it is written by the main thread
+        self._queue_file_row(product, item, path, api_checksum, local_checksum)
+
+    def _download_to_part(
+        self, url: str, part_path: Path, headers: dict[str, str], hasher: Any | None
+    ) -> int | None:
+        """
+        Stream a file into part_path, feeding it to hasher on the way. Returns the response's
+        status code, or None if the download failed (part_path is removed then). Nothing is
+        written when conditional headers were sent and the server answered "304 Not Modified".
+        """
+        try:
+            part_path.parent.mkdir(parents=True, exist_ok=True)
+            with self._http.stream("GET", url, headers=headers) as file_response:
+                if headers and file_response.status_code == httpx.codes.NOT_MODIFIED:
+                    return file_response.status_code
+                file_response.raise_for_status() # Raise exception for bad status codes
+                with open(part_path, "wb") as f:
+                    for chunk in file_response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk) # Hash while downloading, no second pass
+                return file_response.status_code
+        except httpx.HTTPStatusError as e:
+            logger.error("HTTP error downloading %s: %s", part_path, e)
+        except httpx.RequestError as e:
+            logger.error("Network error downloading %s: %s", part_path, e)
+        except OSError as e:
+            logger.error("Failed to write file %s: %s", part_path, e)
+        _remove_quietly(part_path)
+        return None
+
+    def _queue_file_row(
+        self,
+        product: Product,
+        item: DownloadItem,
+        path: Path,
+        api_checksum: str | None,
+        local_checksum: str | None,
+    ) -> None:
+        """Queue a files table row for a stored item, to be saved by the main thread."""
         api_mod_iso = product["fileLastModified"] # Already ISO string
-
-        with self._db_conn:
-            self._db_conn.execute(
-                """
-                INSERT INTO files (
-                    product_id, item_id, filename, api_last_modified, api_checksum,
-                    local_path, local_last_synced, local_checksum
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(product_id, item_id) DO UPDATE SET
-                    filename = excluded.filename,
-                    api_last_modified = excluded.api_last_modified,
-                    api_checksum = excluded.api_checksum,
-                    local_path = excluded.local_path,
-                    local_last_synced = excluded.local_last_synced,
-                    local_checksum = excluded.local_checksum;
-                """,
-                (
-                    product_id, item_id, item["filename"], api_mod_iso, api_checksum,
-                    str(path), now_iso, local_checksum # Store path as string
-                )
+        self._file_rows.put(
+            (
+                product["orderProductId"], item["index"], item["filename"], api_mod_iso,
+                api_checksum, str(path), self._sync_started_iso, local_checksum # Path as string
             )
-        logger.debug("Updated DB cache for %s - %s", product["name"], item["filename"])
-
+        )
 
     def _cleanup_db(self) -> None:
         """Remove items from DB that were not present in the last API sync."""
@@ -330,36 +499,51 @@ class DrpgSync:
              logger.debug("Skipping DB cleanup as no items were processed from API.")
              return
 
-        # Create placeholders for the IN clause
-        placeholders = ','.join('?' for _ in self._touched_items)
-        # Flatten the set of tuples into a list of alternating product_id, item_id
-        flat_keys = [val for pair in self._touched_items for val in pair]
-
-        # Construct the query carefully to delete rows not matching the composite keys
-        # This is a bit tricky with composite keys in standard SQL IN clause.
-        # A safer way is to select the keys to keep and delete the rest.
-
-        # Get all keys currently in the DB
-        cursor = self._db_conn.execute("SELECT product_id, item_id FROM files")
-        db_keys = {tuple(row) for row in cursor.fetchall()}
-
-        keys_to_delete = db_keys - self._touched_items
+        # Let SQLite do the diff instead of pulling every row into Python
+        with self._transaction():
+            self._db_conn.execute(
+                """
+                CREATE TEMP TABLE touched (
+                    product_id INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    PRIMARY KEY (product_id, item_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self._db_conn.executemany(
+                "INSERT INTO touched (product_id, item_id) VALUES (?, ?)",
+                map(_split_item_key, self._touched_items),
+            )
+            deleted = self._db_conn.execute(
+                """
+                DELETE FROM files
+                WHERE (product_id, item_id) NOT IN (SELECT product_id, item_id FROM touched)
+                """
+            ).rowcount
+            self._db_conn.execute("DROP TABLE touched")
 
-        if keys_to_delete:
-            logger.info("Removing %d orphaned item(s) from DB cache.", len(keys_to_delete))
-            with self._db_conn:
-                self._db_conn.executemany(
-                    "DELETE FROM files WHERE product_id = ? AND item_id = ?",
-                    list(keys_to_delete)
-                )
-            # Optional: Clean up products with no remaining files?
-            # self._db_conn.execute("DELETE FROM products WHERE product_id NOT IN (SELECT DISTINCT product_id FROM files)")
+        if deleted:
+            logger.info("Removed %d orphaned item(s) from DB cache.", deleted)
+        # Optional: Clean up products with no remaining files?
+        # self._db_conn.execute("DELETE FROM products WHERE product_id NOT IN (SELECT DISTINCT product_id FROM files)")
 
     def _close_db(self) -> None:
-        """Close the database connection."""
-        if self._db_conn:
-            self._db_conn.close()
-            self._db_conn = None # type: ignore
+        """Close the database connection and the download client."""
+        # Either may be missing if __init__ failed early
+        http = getattr(self, "_http", None)
+        if http:
+            http.close()
+        db_conn = getattr(self, "_db_conn", None)
+        self._db_conn = None # type: ignore
+        if db_conn:
+            try:
+                # Refresh query planner statistics (cheap, only analyzes what changed)
+                db_conn.execute("PRAGMA optimize;")
+            except sqlite3.Error as e:
+                # Only an optimization, e.g. the database may be locked by another process
+                logger.debug("Could not optimize the database: %s", e)
+            finally:
+                db_conn.close()
             logger.debug("Database connection closed.")
 
     def __del__(self) -> None:
@@ -367,18 +551,32 @@ class DrpgSync:
         self._close_db()
 
 
+    def _api_checksum(self, product: Product, item: DownloadItem) -> str | None:
+        """Newest checksum of an item, as computed when the API listing was read."""
+        try:
+            return self._api_checksums[_item_key(product["orderProductId"], item["index"])]
+        except KeyError:
+            return _newest_checksum(item)
+
     def _file_path(self, product: Product, item: DownloadItem) -> Path:
+        product_dir = self._product_dirs.get(product["orderProductId"])
+        if product_dir is None:
+            product_dir = self._product_dir(product)
+        item_name = _normalize_path_part(item["filename"], self._config.compatibility_mode)
+        return product_dir / item_name
+
+    def _product_dir(self, product: Product) -> Path:
         publishers_name = _normalize_path_part(
             product.get("publisher", {}).get("name", "Others"), self._config.compatibility_mode
         )
         product_name = _normalize_path_part(product["name"], self._config.compatibility_mode)
-        item_name = _normalize_path_part(item["filename"], self._config.compatibility_mode)
         if self._config.omit_publisher:
-            return self._config.library_path / product_name / item_name
+            return self._config.library_path / product_name
         else:
-            return self._config.library_path / publishers_name / product_name / item_name
+            return self._config.library_path / publishers_name / product_name
 
 
+@functools.lru_cache(maxsize=4096)
 def _normalize_path_part(part: str, compatibility_mode: bool) -> str:
     """
     Strip out unwanted characters in parts of the path to the downloaded file representing
@@ -410,32 +608,94 @@ def _normalize_path_part(part: str, compatibility_mode: bool) -> str:
     return part
 
 
+def _remove_quietly(path: Path) -> None:
+    """Remove a leftover file, ignoring errors."""
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.debug("Could not remove %s: %s", path, e)
+
+
+def _item_key(product_id: int, item_id: int) -> int:
+    """
+    Pack a product's and its item's IDs into one int, which is smaller and cheaper to hash
+    than a tuple. Item IDs are file indexes within a product, so they fit in 32 bits.
+    """
+    return product_id << 32 | item_id
+
+
+def _split_item_key(key: int) -> tuple[int, int]:
+    """Unpack a key made by _item_key() back into product and item IDs."""
+    return key >> 32, key & 0xFFFFFFFF
+
+
+def _conditional_headers(
+    db_info: DbFileInfo | None, path: Path, api_checksum: str | None
+) -> dict[str, str]:
+    """
+    Build headers that allow the server to answer "304 Not Modified" instead of sending the
+    file again. Only used when the file on disk is known to match the API's newest checksum,
+    so keeping it can never leave a stale or missing file behind.
+    """
+    if (
+        not db_info
+        or not api_checksum
+        or db_info.local_checksum != api_checksum
+        or db_info.local_path != str(path)
+        or not path.exists()
+    ):
+        return {}
+
+    headers = {"If-None-Match": f'"{db_info.local_checksum}"'}
+    if db_info.local_last_synced:
+        # usegmt=True only accepts UTC datetimes, timestamps with other offsets are converted
+        last_synced = datetime.fromisoformat(db_info.local_last_synced).astimezone(timezone.utc)
+        headers["If-Modified-Since"] = format_datetime(last_synced, usegmt=True)
+    return headers
+
+
 def _newest_checksum(item: DownloadItem) -> str | None:
     return max(
         item["checksums"] or [],
         default={"checksum": None},
-        key=lambda s: datetime.fromisoformat(s["checksumDate"]),
+        # ISO 8601 dates in the same format sort chronologically as plain strings
+        key=itemgetter("checksumDate"),
     )["checksum"]
 
 
+class _CompatibleCharacters(dict):
+    """
+    A str.translate() table that replaces every character except ASCII letters, digits,
+    periods and whitespace with "_". Entries are computed on first use and then reused.
+    """
+
+    allowed = frozenset(string.ascii_letters + string.digits + ".")
+
+    def __missing__(self, codepoint: int) -> int | str:
+        char = chr(codepoint)
+        value = codepoint if char in self.allowed or char.isspace() else "_"
+        self[codepoint] = value
+        return value
+
+
 class PathNormalizer:
     separator_drpg = " - "
-    multiple_drpg_separators = f"({separator_drpg})+"
+    multiple_drpg_separators = re.compile(f"({separator_drpg})+")
     multiple_whitespaces = re.compile(r"\s+")
-    non_standard_characters = re.compile(r"[^a-zA-Z0-9.\s]")
+    forbidden_characters = re.compile(r'[<>:"/\\|?*]')
+    drivethrurpg_compatible_table = _CompatibleCharacters()
 
     @classmethod
     def normalize_drivethrurpg_compatible(cls, part: str) -> str:
-        separator = "_"
-        part = re.sub(cls.non_standard_characters, separator, part)
-        part = re.sub(cls.multiple_whitespaces, " ", part)
+        part = part.translate(cls.drivethrurpg_compatible_table)
+        part = cls.multiple_whitespaces.sub(" ", part)
         return part
 
     @classmethod
     def normalize(cls, part: str) -> str:
-        separator = PathNormalizer.separator_drpg
+        separator = cls.separator_drpg
         part = html.unescape(part)
-        part = re.sub(r'[<>:"/\\|?*]', separator, part).strip(separator)
-        part = re.sub(PathNormalizer.multiple_drpg_separators, separator, part)
-        part = re.sub(PathNormalizer.multiple_whitespaces, " ", part)
+        part = cls.forbidden_characters.sub(separator, part).strip(separator)
+        part = cls.multiple_drpg_separators.sub(separator, part)
+        part = cls.multiple_whitespaces.sub(" ", part)
         return part
@@ -4,39 +4,62 @@ import logging
 from pathlib import Path
 import json # For config saving/loading
 import sys
+import atexit # Flushes pending config changes on exit
 import functools # Added for partial application
-from logging.handlers import QueueHandler, QueueListener
-from queue import Queue
-import pyperclip # Added for clipboard access
+import hashlib
+import tempfile
+from collections import deque
+
+try:
+    import orjson # Optional, parses and serializes the config much faster than json
+except ImportError:
+    orjson = None
 
 # Import core drpg components
 import os # Needed for default db path logic
 from drpg.config import Config
-from drpg.sync import DrpgSync
 # Reuse the default db path logic if possible, or replicate it
 # Let's replicate for simplicity here to avoid potential import cycles/issues
 def _default_db_path_tui() -> Path:
     # Simple cross-platform default in user's home directory or config dir
-    config_home = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config"))
+    config_home = Path(os.environ.get("XDG_CONFIG_HOME", _HOME / ".config"))
     return config_home / "drpg" / "library.db"
 
 from textual.app import App, ComposeResult
+from textual.binding import Binding
 from textual.containers import Container, VerticalScroll
 from textual.logging import TextualHandler # For TUI logging
-from textual.app import App, ComposeResult
-from textual.containers import Container, VerticalScroll
-from textual.events import Key # Added for on_key
-from textual.logging import TextualHandler # For TUI logging
 from textual.reactive import var
 from textual.screen import Screen
 from textual.widgets import Button, Footer, Header, Input, Log, Static, Switch, Label, ProgressBar # Added ProgressBar
 
+# Resolved once, Path.home() goes through expanduser and environment lookups
+_HOME = Path.home()
 # Configuration file path
-CONFIG_FILE = Path.home() / ".drpg_tui_config.json"
+CONFIG_FILE = _HOME / ".drpg_tui_config.json"
+_LOG_FILENAME = _HOME / ".drpg_tui.log" # Log to home dir
+_SYNC_LOG_MAX_LINES = 10_000 # Older lines are still in the log file
+_SYNC_LOG_DRAIN_INTERVAL = 0.05 # Seconds between moving collected log lines to the widget
+_SYNC_LOG_DRAIN_BATCH = 500 # Most lines moved to the widget per drain
+
+# Level names to numbers, looked up instead of getattr() on the logging module
+if sys.version_info >= (3, 11):
+    _LEVEL_MAP = logging.getLevelNamesMapping()
+else:
+    _LEVEL_MAP = {
+        "CRITICAL": logging.CRITICAL,
+        "FATAL": logging.FATAL,
+        "ERROR": logging.ERROR,
+        "WARN": logging.WARNING,
+        "WARNING": logging.WARNING,
+        "INFO": logging.INFO,
+        "DEBUG": logging.DEBUG,
+        "NOTSET": logging.NOTSET,
+    }
 
 # Default configuration
 DEFAULT_CONFIG = {
-    "library_path": str(Path.home() / "DRPG_TUI_Downloads"),
+    "library_path": str(_HOME / "DRPG_TUI_Downloads"),
     "api_token": "", # Default to empty
     "use_checksums": False,
     "validate": False,
@@ -48,51 +71,160 @@ DEFAULT_CONFIG = {
     "db_path": str(_default_db_path_tui()), # Add default db_path
 }
 
+# TUI config keys that map to Config attributes, "api_token" is called "token" there
+_CONFIG_ATTRS = {key: key for key in DEFAULT_CONFIG if key in Config.__dataclass_fields__}
+_CONFIG_ATTRS["api_token"] = "token"
+
 # --- Configuration Loading/Saving ---
+if orjson is not None:
+    _json_loads = orjson.loads
+
+    def _json_dumps(data: dict) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+else:
+    _json_loads = json.loads
+
+    def _json_dumps(data: dict) -> bytes:
+        return json.dumps(data, indent=4).encode("utf-8")
+
+_CONFIG_CACHE: dict | None = None # Parsed config, shared by all load_config() calls
+_LAST_CONFIG_DIGEST: bytes | None = None # Digest of the bytes last read from or written to disk
+
+def _read_file(path: Path) -> bytes:
+    """Reads a small file with raw os calls, skipping the buffered file object."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        while chunk := os.read(fd, 1 << 20):
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+def _write_file(path: Path, data: bytes) -> None:
+    """Atomically replaces a small file, writing it with raw os calls."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd) # Make sure the data is on disk before it replaces the old file
+        finally:
+            os.close(fd)
+        os.replace(tmp_name, path) # Readers see either the old or the new file, never a partial one
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+def _config_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
 def load_config() -> dict:
+    """Returns the configuration, reading it from disk only on the first call."""
+    global _CONFIG_CACHE
+    if _CONFIG_CACHE is None:
+        _CONFIG_CACHE = _read_config()
+    return _CONFIG_CACHE
+
+def _read_config() -> dict:
     """Loads configuration from JSON file, returning defaults if not found or invalid."""
-    if CONFIG_FILE.exists():
-        try:
-            with open(CONFIG_FILE, "r") as f:
-                data = json.load(f)
-                # Ensure all keys are present, add defaults if missing
-                config = DEFAULT_CONFIG.copy()
-                # Ensure loaded keys exist in defaults before updating
-                valid_data = {k: v for k, v in data.items() if k in config}
-                config.update(valid_data) # Overwrite defaults with loaded data
-                # Ensure specific types
-                config["threads"] = int(config.get("threads", 5))
-                # Ensure paths are strings for JSON, but we'll convert later
-                config["library_path"] = str(config.get("library_path", DEFAULT_CONFIG["library_path"]))
-                config["db_path"] = str(config.get("db_path", DEFAULT_CONFIG["db_path"]))
-                return config
-        except (json.JSONDecodeError, IOError, ValueError, TypeError) as e: # Added TypeError
-            # Use basic print for early errors before logging might be set up
-            print(f"Error loading config file {CONFIG_FILE}: {e}. Using defaults.", file=sys.stderr)
-            return DEFAULT_CONFIG.copy()
-    else:
+    global _LAST_CONFIG_DIGEST
+    try:
+        # Parse the whole file at once instead of through a buffered text reader
+        raw = _read_file(CONFIG_FILE)
+        # Remembered so saving settings that didn't change doesn't rewrite the file
+        _LAST_CONFIG_DIGEST = _config_digest(raw)
+        data = _json_loads(raw)
+        # Defaults first, then the known keys from the file, merged in one step
+        config = {**DEFAULT_CONFIG, **{k: v for k, v in data.items() if k in DEFAULT_CONFIG}}
+        # Ensure specific types
+        config["threads"] = int(config["threads"])
+        # Ensure paths are strings for JSON, but we'll convert later
+        config["library_path"] = str(config["library_path"])
+        config["db_path"] = str(config["db_path"])
+        return config
+    except FileNotFoundError: # No exists() check up front, opening the file is enough
+        return DEFAULT_CONFIG.copy()
+    except (json.JSONDecodeError, OSError, ValueError, TypeError) as e: # Added TypeError
+        # Write to stderr directly, logging might not be set up this early
+        sys.stderr.write(f"Error loading config file {CONFIG_FILE}: {e}. Using defaults.\n")
         return DEFAULT_CONFIG.copy()
 
+_PENDING_CONFIG: dict | None = None # Saved but not yet written to disk
+_CONFIG_FLUSH_INTERVAL = 2.0 # Seconds, saves in between are written once
+
 def save_config(config_data: dict) -> None:
-    """Saves configuration to JSON file, ensuring paths are strings."""
+    """Saves configuration, the file itself is written by the next flush_config()."""
+    global _CONFIG_CACHE, _PENDING_CONFIG
+    _CONFIG_CACHE = config_data # Later load_config() calls see the new settings
+    _PENDING_CONFIG = config_data
+
+def flush_config() -> None:
+    """Writes the last saved configuration to JSON file, ensuring paths are strings."""
+    global _PENDING_CONFIG, _LAST_CONFIG_DIGEST
+    if _PENDING_CONFIG is None:
+        return
+    config_data, _PENDING_CONFIG = _PENDING_CONFIG, None
     try:
-        # Create a copy to modify for saving
-        save_data = config_data.copy()
-        # Ensure paths are strings
-        if isinstance(save_data.get("library_path"), Path):
-             save_data["library_path"] = str(save_data["library_path"])
-        if isinstance(save_data.get("db_path"), Path):
-             save_data["db_path"] = str(save_data["db_path"])
+        # Ensure paths are strings, built in one pass instead of copying and then patching
+        save_data = {k: str(v) if isinstance(v, Path) else v for k, v in config_data.items()}
 
         # Ensure parent directory for config file exists
         CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(save_data, f, indent=4)
+        # Serialize in memory first, then write it out in one go
+        buf = _json_dumps(save_data)
+        digest = _config_digest(buf)
+        if digest == _LAST_CONFIG_DIGEST and CONFIG_FILE.exists():
+            logging.debug("Configuration unchanged, not rewriting it")
+            return
+        _write_file(CONFIG_FILE, buf)
+        _LAST_CONFIG_DIGEST = digest
         logging.info(f"Configuration saved to {CONFIG_FILE}")
     except IOError as e:
         logging.error(f"Error saving config file {CONFIG_FILE}: {e}")
 
+atexit.register(flush_config)
+
+# --- Logging ---
+
+class _TuiLogHandler(logging.Handler):
+    """Collects formatted log records from any thread for a Log widget to pick up."""
+
+    def __init__(self):
+        super().__init__()
+        # Formatted in the logging thread, appending to a deque needs no extra locking.
+        # Bounded like the widget, if the UI falls behind the oldest lines are dropped.
+        self.lines: deque[str] = deque(maxlen=_SYNC_LOG_MAX_LINES)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+_DRPG_LOGGER = logging.getLogger("drpg")
+_HTTPX_LOGGER = logging.getLogger("httpx")
+_HTTPCORE_LOGGER = logging.getLogger("httpcore")
+_HPACK_LOGGER = logging.getLogger("hpack")
+
+def _apply_log_levels(config: dict) -> None:
+    """Sets the drpg and httpx logger levels from the configured log level."""
+    log_level = _LEVEL_MAP.get(config.get("log_level", "INFO").upper(), logging.INFO)
+    _DRPG_LOGGER.setLevel(log_level)
+    if log_level <= logging.DEBUG:
+        httpx_log_level = logging.DEBUG
+        httpx_deps_log_level = logging.INFO
+    else:
+        httpx_log_level = logging.WARNING
+        httpx_deps_log_level = logging.WARNING
+    _HTTPX_LOGGER.setLevel(httpx_log_level)
+    _HTTPCORE_LOGGER.setLevel(httpx_deps_log_level)
+    _HPACK_LOGGER.setLevel(httpx_deps_log_level)
+
+
 # --- Screens ---
 
 class MainScreen(Screen):
@@ -103,16 +235,16 @@ class MainScreen(Screen):
     ]
 
     def compose(self) -> ComposeResult:
-        config_data = self.app.config_data
+        get = self.app.config_data.get
         with Container(id="main-container"):
             yield Header()
-            yield Label(f"Library Path: {config_data.get('library_path', 'Not Set')}", id="library-path-display")
+            yield Label(self._library_path_text(), id="library-path-display")
             # Disable sync button if token is not set
             yield Button(
                 "Sync Library",
                 id="sync",
                 variant="primary",
-                disabled=not config_data.get("api_token")
+                disabled=not get("api_token")
             )
             yield Button("Settings", id="settings")
             yield Button("Quit", id="quit", variant="error")
@@ -120,13 +252,18 @@ class MainScreen(Screen):
 
     def on_mount(self) -> None:
         """Check token status on mount."""
+        # Kept so settings saves update them without querying the DOM
+        self._sync_button = self.query_one("#sync", Button)
+        self._path_label = self.query_one("#library-path-display", Label)
+        self._path_label_text = self._library_path_text()
         self.update_sync_button_status()
 
     def update_sync_button_status(self) -> None:
         """Enable/disable sync button based on API token presence."""
         try:
-            sync_button = self.query_one("#sync", Button)
-            sync_button.disabled = not self.app.config_data.get("api_token")
+            disabled = not self.app.config_data.get("api_token")
+            if self._sync_button.disabled != disabled: # Only touch the reactive when it changes
+                self._sync_button.disabled = disabled
         except Exception as e:
             logging.error(f"Could not update sync button status: {e}")
 
@@ -150,68 +287,85 @@ class MainScreen(Screen):
         """Action to request quitting the app."""
         self.app.action_quit()
 
+    def _library_path_text(self) -> str:
+        return f"Library Path: {self.app.config_data.get('library_path', 'Not Set')}"
+
     def update_library_path_display(self) -> None:
         """Updates the library path display."""
         try:
-            path_display = self.query_one("#library-path-display", Label)
-            path_display.update(f"Library Path: {self.app.config_data.get('library_path', 'Not Set')}")
+            text = self._library_path_text()
+            if text != self._path_label_text:
+                self._path_label.update(text)
+                self._path_label_text = text
             self.update_sync_button_status() # Also update sync button status
         except Exception as e:
             logging.error(f"Could not update main screen path display: {e}")
 
 
+class _ApiTokenInput(Input):
+    """API token input that pastes through the settings screen's clipboard handling."""
+    BINDINGS = [
+        # Replaces Input's own ctrl+v paste, only active while this input is focused
+        Binding("ctrl+v", "screen.paste_api_token", "Paste Token", show=False, priority=True),
+    ]
+
+
 class SettingsScreen(Screen):
     """Screen for configuring DRPG settings."""
     BINDINGS = [
         ("escape", "app.pop_screen", "Back"),
         ("ctrl+s", "save_settings", "Save"),
-        # ("ctrl+v", "paste_api_token", "Paste Token"), # Removed screen binding, will handle in on_key
     ]
 
-    def on_key(self, event: Key) -> None:
-        """Handle key presses for the settings screen."""
-        # Check if Ctrl+V was pressed and the API token input is focused
-        if event.key == "ctrl+v":
-            api_token_input = self.query_one("#api_token", Input)
-            if self.app.focused is api_token_input:
-                logging.info("Ctrl+V detected while API token input focused.")
-                self.action_paste_api_token()
-                event.prevent_default() # Stop the Input widget from also handling it
-
     def compose(self) -> ComposeResult:
-        config_data = self.app.config_data
+        get = self.app.config_data.get # Bound once, looked up for every widget
+        # Widgets are kept as attributes so saving doesn't have to query the DOM for each of them
         yield Header()
         with VerticalScroll(id="settings-form"):
             yield Label("API Token:", classes="label")
-            yield Input(config_data.get("api_token", ""), id="api_token", password=True)
+            self._api_token_input = _ApiTokenInput(
+                get("api_token", ""), id="api_token", password=True
+            )
+            yield self._api_token_input
 
             yield Label("Library Path:", classes="label")
-            yield Input(config_data.get("library_path", ""), id="library_path")
+            self._library_path_input = Input(get("library_path", ""), id="library_path")
+            yield self._library_path_input
 
             yield Label("Number of Download Threads:", classes="label")
-            yield Input(str(config_data.get("threads", 5)), id="threads", type="integer")
+            self._threads_input = Input(str(get("threads", 5)), id="threads", type="integer")
+            yield self._threads_input
 
             # TODO: Add log level selection (e.g., Select widget)
-            yield Label(f"Log Level: {config_data.get('log_level', 'INFO')}", classes="label")
+            yield Label(f"Log Level: {get('log_level', 'INFO')}", classes="label")
 
             with Container(classes="switch-container"):
-                yield Switch(config_data.get("use_checksums", False), id="use_checksums")
+                self._use_checksums_switch = Switch(get("use_checksums", False), id="use_checksums")
+                yield self._use_checksums_switch
                 yield Label("Use Checksums (Slower, Precise)", classes="label inline")
 
             with Container(classes="switch-container"):
-                yield Switch(config_data.get("validate", False), id="validate")
+                self._validate_switch = Switch(get("validate", False), id="validate")
+                yield self._validate_switch
                 yield Label("Validate Downloads (Uses Checksums)", classes="label inline")
 
             with Container(classes="switch-container"):
-                yield Switch(config_data.get("compatibility_mode", False), id="compatibility_mode")
+                self._compatibility_mode_switch = Switch(
+                    get("compatibility_mode", False), id="compatibility_mode"
+                )
+                yield self._compatibility_mode_switch
                 yield Label("Use DriveThruRPG Naming Compatibility", classes="label inline")
 
             with Container(classes="switch-container"):
-                yield Switch(config_data.get("omit_publisher", False), id="omit_publisher")
+                self._omit_publisher_switch = Switch(
+                    get("omit_publisher", False), id="omit_publisher"
+                )
+                yield self._omit_publisher_switch
                 yield Label("Omit Publisher Name in Path", classes="label inline")
 
             with Container(classes="switch-container"):
-                yield Switch(config_data.get("dry_run", False), id="dry_run")
+                self._dry_run_switch = Switch(get("dry_run", False), id="dry_run")
+                yield self._dry_run_switch
                 yield Label("Dry Run (Don't Download)", classes="label inline")
 
         yield Button("Save", id="save", variant="success")
@@ -225,33 +379,36 @@ class SettingsScreen(Screen):
             self.action_save_settings()
 
     def action_save_settings(self) -> None:
-        new_config = self.app.config_data.copy()
-        new_config["api_token"] = self.query_one("#api_token", Input).value
-        new_config["library_path"] = self.query_one("#library_path", Input).value
         try:
-            threads_value = int(self.query_one("#threads", Input).value)
-            if threads_value > 0:
-                new_config["threads"] = threads_value
-            else:
+            threads_value = int(self._threads_input.value)
+            if threads_value <= 0:
                  self.app.notify("Threads must be a positive number.", title="Error", severity="error")
                  return
         except ValueError:
             self.app.notify("Invalid number for threads.", title="Error", severity="error")
             return
 
-        new_config["use_checksums"] = self.query_one("#use_checksums", Switch).value
-        new_config["validate"] = self.query_one("#validate", Switch).value
-        new_config["compatibility_mode"] = self.query_one("#compatibility_mode", Switch).value
-        new_config["omit_publisher"] = self.query_one("#omit_publisher", Switch).value
-        new_config["dry_run"] = self.query_one("#dry_run", Switch).value
-
-        # Preserve db_path (it's not editable here)
-        new_config["db_path"] = self.app.config_data.get("db_path", DEFAULT_CONFIG["db_path"])
+        old_config = self.app.config_data
+        # Built from scratch, the old dict is replaced so there is nothing to copy
+        new_config = {
+            "library_path": self._library_path_input.value,
+            "api_token": self._api_token_input.value,
+            "use_checksums": self._use_checksums_switch.value,
+            "validate": self._validate_switch.value,
+            "compatibility_mode": self._compatibility_mode_switch.value,
+            "omit_publisher": self._omit_publisher_switch.value,
+            "threads": threads_value,
+            # Not editable here, keep the current values
+            "log_level": old_config.get("log_level", DEFAULT_CONFIG["log_level"]),
+            "dry_run": self._dry_run_switch.value,
+            "db_path": old_config.get("db_path", DEFAULT_CONFIG["db_path"]),
+        }
 
         # TODO: Update log level
 
-        self.app.config_data = new_config # Update app's config
-        save_config(self.app.config_data) # Save the updated config
+        self.app.update_config(new_config) # Update app's config
+        save_config(new_config) # Save the updated config
+        _apply_log_levels(new_config)
         self.app.notify("Settings saved.", title="Success")
 
         try:
@@ -264,25 +421,51 @@ class SettingsScreen(Screen):
 
     def action_paste_api_token(self) -> None:
         """Paste clipboard content into the API token input."""
+        # Clipboard tools can be slow or hang (e.g. an unresponsive X server),
+        # keep them off the UI thread
+        self.run_worker(self._read_clipboard, thread=True, exclusive=True, group="clipboard")
+
+    def _read_clipboard(self) -> None:
+        """Reads the clipboard in a worker thread and hands the result to the UI thread."""
+        # Imported on first paste, most sessions never touch the clipboard
+        import pyperclip
+
         try:
             clipboard_content = pyperclip.paste()
-            if clipboard_content:
-                api_token_input = self.query_one("#api_token", Input)
-                api_token_input.value = clipboard_content
-                self.app.notify("API Token pasted from clipboard.", title="Pasted")
-            else:
-                self.app.notify("Clipboard is empty.", title="Info", severity="information")
         except pyperclip.PyperclipException as e:
             logging.error(f"Clipboard error: {e}")
             error_message = f"Could not access clipboard: {e}"
             # Check if on Linux and provide a more specific hint
             if sys.platform.startswith('linux'):
-                error_message += "\n\nOn Linux, this often means 'xclip' or 'xsel' is not installed.\nTry: sudo apt install xclip (or equivalent for your distribution)."
+                error_message += (
+                    "\n\nOn Linux, this often means 'xclip' or 'xsel' is not installed."
+                    "\nTry: sudo apt install xclip (or equivalent for your distribution)."
+                )
             # Use a longer timeout for the more detailed message
-            self.app.notify(error_message, title="Clipboard Error", severity="error", timeout=10)
-        except Exception as e: # Catch potential query errors etc.
+            self.app.call_from_thread(
+                self.app.notify,
+                error_message,
+                title="Clipboard Error",
+                severity="error",
+                timeout=10,
+            )
+        except Exception as e:
             logging.error(f"Error during paste action: {e}")
-            self.app.notify("An unexpected error occurred during paste.", title="Error", severity="error")
+            self.app.call_from_thread(
+                self.app.notify,
+                "An unexpected error occurred during paste.",
+                title="Error",
+                severity="error",
+            )
+        else:
+            self.app.call_from_thread(self._paste_api_token, clipboard_content)
+
+    def _paste_api_token(self, clipboard_content: str) -> None:
+        if clipboard_content:
+            self._api_token_input.value = clipboard_content
+            self.app.notify("API Token pasted from clipboard.", title="Pasted")
+        else:
+            self.app.notify("Clipboard is empty.", title="Info", severity="information")
 
 
 class SyncScreen(Screen):
@@ -297,22 +480,42 @@ class SyncScreen(Screen):
         yield Header()
         yield Static("Syncing library...", id="sync-status")
         # TODO: Add ProgressBar widget
-        yield Log(id="sync-log", highlight=True)
+        # Capped so syncing a huge library doesn't keep every log line in memory
+        yield Log(id="sync-log", highlight=True, max_lines=_SYNC_LOG_MAX_LINES)
         yield Footer()
 
     def on_mount(self) -> None:
         """Start the sync process when the screen is mounted."""
-        self.query_one("#sync-log", Log).clear() # Clear log on new sync
+        # Looked up once here, the sync methods and the worker thread reuse them
+        self._log_widget = self.query_one("#sync-log", Log)
+        self._status_widget = self.query_one("#sync-status", Static)
+        self._log_widget.clear() # Clear log on new sync
+        # The worker logs into this handler, a timer writes its lines to the widget in batches
+        self._log_handler = _TuiLogHandler()
+        self.set_interval(_SYNC_LOG_DRAIN_INTERVAL, self._drain_log_lines)
         self.run_sync_worker()
 
+    def _drain_log_lines(self) -> None:
+        """Moves the log lines collected since the last call to the log widget."""
+        popleft = self._log_handler.lines.popleft
+        batch = []
+        try:
+            # Limited per tick so a burst of records doesn't stall the UI in one go
+            for _ in range(_SYNC_LOG_DRAIN_BATCH):
+                batch.append(popleft())
+        except IndexError:
+            pass
+        if batch:
+            self._log_widget.write_lines(batch)
+
     def run_sync_worker(self) -> None:
         """Runs the DrpgSync logic in a background worker thread."""
         if self.sync_running:
             self.app.notify("Sync is already in progress.", title="Info")
             return
 
-        log_widget = self.query_one("#sync-log", Log)
-        status_widget = self.query_one("#sync-status", Static)
+        log_widget = self._log_widget
+        status_widget = self._status_widget
         status_widget.update("Starting sync...")
         self.sync_running = True
 
@@ -320,36 +523,25 @@ class SyncScreen(Screen):
         # Create a Config object instance
         try:
             # Convert paths back to Path objects for DrpgSync
-            library_path = Path(self.app.config_data["library_path"]).expanduser()
+            library_path = self.app.library_path
             db_path = Path(self.app.config_data["db_path"]).expanduser()
 
             # Ensure db directory exists before sync
             db_path.parent.mkdir(parents=True, exist_ok=True)
 
             # Create Config instance dynamically
+            fields = {
+                _CONFIG_ATTRS[key]: value
+                for key, value in self.app.config_data.items()
+                if key in _CONFIG_ATTRS
+            }
+            # Paths and threads need their proper types
+            fields["library_path"] = library_path
+            fields["db_path"] = db_path
+            fields["threads"] = int(fields["threads"])
             sync_config = Config()
-            for key, value in self.app.config_data.items():
-                # Map TUI config key "api_token" to Config attribute "token"
-                config_key = key
-                if key == "api_token":
-                    config_key = "token" # Map the key name
-
-                # Check if the *target* attribute name exists in the Config class definition
-                # (We can check against Config.__annotations__ or Config.__dataclass_fields__)
-                if config_key in Config.__annotations__: # Check against the class definition
-                    # Special handling for paths
-                    if config_key == "library_path":
-                        setattr(sync_config, config_key, library_path) # Use the already created Path object
-                    elif config_key == "db_path":
-                         setattr(sync_config, config_key, db_path) # Use the already created Path object
-                    # Ensure threads is int
-                    elif config_key == "threads":
-                         setattr(sync_config, config_key, int(value))
-                    # Set other attributes directly
-                    else:
-                        setattr(sync_config, config_key, value)
-                # else: # Optional: Log if a key from config doesn't match any Config attribute
-                #    logging.warning(f"Config key '{key}' not found in Config class, skipping.")
+            # Config is declared with init=False, so fill in its attributes with a single update
+            vars(sync_config).update(fields)
         except (KeyError, ValueError, TypeError, Exception) as e: # Catch potential errors during config creation
             log_widget.write(f"[bold red]Error creating config:[/bold red] {e}")
             status_widget.update("[bold red]Sync failed (Config Error)[/bold red]")
@@ -374,37 +566,30 @@ class SyncScreen(Screen):
 
     def sync_thread_target(self, sync_config: Config) -> None: # Accept Config object
         """The actual function executed by the background worker."""
-        log_widget = self.query_one("#sync-log", Log)
-        status_widget = self.query_one("#sync-status", Static)
+        log_widget = self._log_widget
+        status_widget = self._status_widget
+
+        # --- Logging Setup for Worker Thread ---
+        # Installed before the syncer is created so its constructor's logs show up too
+        # Levels are set by _apply_log_levels() at startup and whenever settings are saved
+        tui_handler = self._log_handler
+        # Add handler ONLY for the duration of the sync
+        _DRPG_LOGGER.addHandler(tui_handler)
 
         # Create the syncer *inside* the worker thread
         try:
+            # Imported here so httpx is only loaded once a sync actually starts
+            from drpg.sync import DrpgSync
+
             syncer = DrpgSync(sync_config)
         except Exception as e:
             # Use call_from_thread for UI updates from worker
             self.app.call_from_thread(log_widget.write, f"[bold red]Error creating DrpgSync in worker:[/bold red] {e}")
             self.app.call_from_thread(status_widget.update, "[bold red]Sync failed (Syncer Init Error)[/bold red]")
             self.sync_running = False # Ensure sync_running is reset
+            _DRPG_LOGGER.removeHandler(tui_handler)
             return # Stop execution if syncer creation fails
 
-        # --- Logging Setup for Worker Thread ---
-        # Get the root logger used by drpg modules
-        drpg_logger = logging.getLogger("drpg")
-        # Use TextualHandler to forward logs to the widget
-        # Note: TextualHandler is not thread-safe directly, use QueueHandler
-        log_queue = Queue(-1) # Infinite queue size
-        queue_handler = QueueHandler(log_queue)
-        # Add handler ONLY for the duration of the sync
-        drpg_logger.addHandler(queue_handler)
-        # Set level based on config (ensure it's valid)
-        log_level_name = self.app.config_data.get("log_level", "INFO").upper()
-        log_level = getattr(logging, log_level_name, logging.INFO)
-        drpg_logger.setLevel(log_level)
-
-        # Listener thread in the main app thread to process the queue
-        listener = QueueListener(log_queue, log_widget) # Pass log widget directly
-        listener.start()
-
         # --- Execute Sync ---
         try:
             status_widget.update("Syncing...") # Update status via call_from_thread if needed, but direct might work
@@ -412,14 +597,13 @@ class SyncScreen(Screen):
             self.app.call_from_thread(status_widget.update, "[bold green]Sync finished![/bold green]")
         except Exception as e:
             # Log the exception to the TUI log widget
-            drpg_logger.exception("An error occurred during synchronization.")
+            _DRPG_LOGGER.exception("An error occurred during synchronization.")
             self.app.call_from_thread(status_widget.update, f"[bold red]Sync failed:[/bold red] {e}")
         finally:
             # --- Cleanup ---
             self.sync_running = False
-            # Stop the listener and remove the handler
-            listener.stop()
-            drpg_logger.removeHandler(queue_handler)
+            # Remove the handler
+            _DRPG_LOGGER.removeHandler(tui_handler)
             # Reset logger level if necessary, or assume it's managed elsewhere
             # self.app.call_from_thread(self.enable_back_button) # Example
 
@@ -448,17 +632,28 @@ class DrpgTuiApp(App[None]):
         "main": "main",
     }
 
-    def __init__(self):
+    def __init__(self, config: dict | None = None):
         super().__init__()
-        self.config_data = load_config()
+        self.config_data = config if config is not None else load_config()
+        # Parsed once, run_sync_worker() reuses it until the setting changes
+        self.library_path = Path(self.config_data["library_path"]).expanduser()
+
+    def update_config(self, config: dict) -> None:
+        """Replaces the app's config, keeping the parsed library path in step with it."""
+        if config["library_path"] != self.config_data.get("library_path"):
+            self.library_path = Path(config["library_path"]).expanduser()
+        self.config_data = config
 
     def on_mount(self) -> None:
         """Called when the app is mounted."""
+        _apply_log_levels(self.config_data)
+        self.set_interval(_CONFIG_FLUSH_INTERVAL, flush_config)
         self.push_screen("main")
 
     def action_quit(self) -> None:
         """Action to quit the application."""
         # TODO: Check if sync is running and ask for confirmation?
+        flush_config()
         self.exit()
 
     def action_show_settings(self) -> None:
@@ -470,13 +665,12 @@ class DrpgTuiApp(App[None]):
 
 def run_tui() -> None:
     """Configure logging and run the Textual TUI application."""
-    log_filename = Path.home() / ".drpg_tui.log" # Log to home dir
     # Configure root logger - TextualHandler will capture logs sent here
     # File logging for persistent logs
     logging.basicConfig(
         level=logging.INFO, # Set a base level; DrpgSync might override based on config
         handlers=[
-            logging.FileHandler(log_filename, mode='a'),
+            logging.FileHandler(_LOG_FILENAME, mode='a'),
             TextualHandler(), # This handler is used by Textual's Log widget capture
         ],
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -484,26 +678,12 @@ def run_tui() -> None:
     )
     logging.info("--- Starting DRPG TUI Application ---")
 
-    # Set httpx log level based on initial config or default
-    # This needs to be done *after* basicConfig
     config = load_config()
-    app_log_level_name = config.get("log_level", "INFO").upper()
-    app_log_level = getattr(logging, app_log_level_name, logging.INFO)
-    if app_log_level <= logging.DEBUG:
-        httpx_log_level = logging.DEBUG
-        httpx_deps_log_level = logging.INFO
-    else:
-        httpx_log_level = logging.WARNING
-        httpx_deps_log_level = logging.WARNING
-
-    logging.getLogger("httpx").setLevel(httpx_log_level)
-    for name in ("httpcore", "hpack"):
-        logging.getLogger(name).setLevel(httpx_deps_log_level)
     # Apply application key filter globally if needed, or ensure it's applied in cmd.py's setup
     # from drpg.cmd import application_key_filter # Might need adjustment if cmd is not imported
     # logging.getLogger("httpx").addFilter(application_key_filter) # Add filter if needed globally
 
-    app = DrpgTuiApp()
+    app = DrpgTuiApp(config=config) # Reuse the config loaded above
     app.run()
     logging.info("--- Exiting DRPG TUI Application ---")
 
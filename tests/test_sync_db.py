@@ -0,0 +1,411 @@
+import re
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from hashlib import md5
+from pathlib import Path
+from unittest import TestCase, mock
+
+import respx
+
+import drpg.sync
+from drpg.config import Config
+from drpg.custom_types import Checksum, DownloadItem, Product, Publisher
+from drpg.sync import DbFileInfo, DrpgSync
+
+from .fixtures import PrepareDownloadUrlResponseFixture
+
+# Workaround for https://github.com/lundberg/respx/issues/277
+tmp_respx_mock = partial(respx.mock, using="httpx")
+
+
+def make_config(tmp_dir: Path, validate: bool = False) -> Config:
+    config = Config()
+    config.token = "private-token"
+    config.library_path = tmp_dir / "library"
+    config.use_checksums = False
+    config.validate = validate
+    config.log_level = "INFO"
+    config.dry_run = False
+    config.compatibility_mode = False
+    config.omit_publisher = False
+    config.threads = 1
+    config.db_path = tmp_dir / "library.db"
+    return config
+
+
+class ConditionalHeadersTest(TestCase):
+    checksum = "abc123"
+    last_synced = "2024-01-01T12:00:00+00:00"
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name) / "file.pdf"
+        self.path.write_bytes(b"content")
+
+    def db_info(self, **kwargs):
+        fields = {
+            "api_last_modified": "2023-01-01T00:00:00+00:00",
+            "api_checksum": self.checksum,
+            "local_path": str(self.path),
+            "local_last_synced": self.last_synced,
+            "local_checksum": self.checksum,
+        }
+        fields.update(kwargs)
+        return DbFileInfo(**fields)
+
+    def test_headers(self):
+        headers = drpg.sync._conditional_headers(self.db_info(), self.path, self.checksum)
+        self.assertEqual(
+            headers,
+            {
+                "If-None-Match": f'"{self.checksum}"',
+                "If-Modified-Since": "Mon, 01 Jan 2024 12:00:00 GMT",
+            },
+        )
+
+    def test_if_modified_since_is_gmt(self):
+        db_info = self.db_info(local_last_synced="2024-01-01T14:00:00+02:00")
+        headers = drpg.sync._conditional_headers(db_info, self.path, self.checksum)
+        self.assertEqual(headers["If-Modified-Since"], "Mon, 01 Jan 2024 12:00:00 GMT")
+
+    def test_no_last_synced(self):
+        db_info = self.db_info(local_last_synced=None)
+        headers = drpg.sync._conditional_headers(db_info, self.path, self.checksum)
+        self.assertEqual(headers, {"If-None-Match": f'"{self.checksum}"'})
+
+    def test_no_headers(self):
+        moved_path = self.path.with_name("moved.pdf")
+        cases = {
+            "no db info": (None, self.path, self.checksum),
+            "no api checksum": (self.db_info(), self.path, None),
+            "checksum mismatch": (self.db_info(local_checksum="old"), self.path, self.checksum),
+            "path moved": (self.db_info(local_path=str(moved_path)), self.path, self.checksum),
+            "file missing": (self.db_info(local_path=str(moved_path)), moved_path, self.checksum),
+        }
+        for name, args in cases.items():
+            with self.subTest(name):
+                self.assertEqual(drpg.sync._conditional_headers(*args), {})
+
+
+class DrpgSyncProcessItemDbTest(TestCase):
+    download_url = PrepareDownloadUrlResponseFixture.complete()
+    content = b"new content"
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = Path(tmp_dir.name)
+        self.item = DownloadItem(
+            index=0,
+            filename="test.pdf",
+            checksums=[
+                Checksum(
+                    checksum=md5(self.content).hexdigest(),
+                    checksumDate="2024-01-01T00:00:00+00:00",
+                )
+            ],
+        )
+        self.product = Product(
+            productId="test-product",
+            publisher=Publisher(name="Test Publishing"),
+            name="Test rule book",
+            orderProductId=123,
+            fileLastModified="2024-06-01T00:00:00+00:00",
+            files=[self.item],
+        )
+        patcher = mock.patch(
+            "drpg.api.DrpgApi.prepare_download_url", return_value=self.download_url
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_sync(self, validate=False):
+        sync = DrpgSync(make_config(self.tmp_dir, validate))
+        self.addCleanup(sync._close_db)
+        path = sync._file_path(self.product, self.item)
+        return sync, path, path.with_name(path.name + ".part")
+
+    def queued_rows(self, sync):
+        return list(sync._file_rows.queue)
+
+    @tmp_respx_mock()
+    def test_writes_file(self, respx_mock):
+        respx_mock.get(self.download_url["url"]).respond(200, content=self.content)
+        sync, path, part_path = self.make_sync(validate=True)
+
+        sync._process_item_db(self.product, self.item)
+
+        self.assertEqual(path.read_bytes(), self.content)
+        self.assertFalse(part_path.exists())
+        (row,) = self.queued_rows(sync)
+        self.assertEqual(
+            row[5:], (str(path), sync._sync_started_iso, md5(self.content).hexdigest())
+        )
+
+    @tmp_respx_mock()
+    def test_not_modified_keeps_file(self, respx_mock):
+        route = respx_mock.get(self.download_url["url"]).respond(304)
+        sync, path, part_path = self.make_sync()
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b"old content")
+        checksum = self.item["checksums"][0]["checksum"]
+        sync._db_cache[drpg.sync._item_key(123, 0)] = DbFileInfo(
+            api_last_modified="2024-01-01T00:00:00+00:00",
+            api_checksum=checksum,
+            local_path=str(path),
+            local_last_synced="2024-01-02T00:00:00+00:00",
+            local_checksum=checksum,
+        )
+
+        sync._process_item_db(self.product, self.item)
+
+        self.assertEqual(route.calls.last.request.headers["If-None-Match"], f'"{checksum}"')
+        self.assertEqual(path.read_bytes(), b"old content")
+        self.assertFalse(part_path.exists())
+        (row,) = self.queued_rows(sync)
+        self.assertEqual(row[3], self.product["fileLastModified"])
+        self.assertEqual(row[7], checksum)
+
+    @mock.patch("drpg.sync.logger")
+    @tmp_respx_mock()
+    def test_http_error_removes_part_file(self, logger, respx_mock):
+        respx_mock.get(self.download_url["url"]).respond(500)
+        sync, path, part_path = self.make_sync()
+
+        sync._process_item_db(self.product, self.item)
+
+        self.assertFalse(path.exists())
+        self.assertFalse(part_path.exists())
+        self.assertEqual(self.queued_rows(sync), [])
+        self.assertIn("HTTP error", logger.error.call_args.args[0])
+
+    @mock.patch("drpg.sync.logger")
+    @tmp_respx_mock()
+    def test_invalid_checksum_removes_part_file(self, logger, respx_mock):
+        respx_mock.get(self.download_url["url"]).respond(200, content=b"corrupted")
+        sync, path, part_path = self.make_sync(validate=True)
+
+        sync._process_item_db(self.product, self.item)
+
+        self.assertFalse(path.exists())
+        self.assertFalse(part_path.exists())
+        self.assertEqual(self.queued_rows(sync), [])
+        self.assertIn("Invalid checksum", logger.error.call_args.args[0])
+
+    @mock.patch("drpg.sync.logger")
+    @tmp_respx_mock()
+    def test_os_error_removes_part_file(self, logger, respx_mock):
+        respx_mock.get(self.download_url["url"]).respond(200, content=self.content)
+        sync, path, part_path = self.make_sync()
+
+        def open_partially_written(file, mode):
+            Path(file).write_bytes(b"partial")
+            raise OSError("No space left on device")
+
+        with mock.patch("drpg.sync.open", open_partially_written, create=True):
+            sync._process_item_db(self.product, self.item)
+
+        self.assertFalse(path.exists())
+        self.assertFalse(part_path.exists())
+        self.assertEqual(self.queued_rows(sync), [])
+        self.assertIn("Failed to write file", logger.error.call_args.args[0])
+
+
+class DrpgSyncTest(TestCase):
+    download_url = PrepareDownloadUrlResponseFixture.complete()
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.config = make_config(Path(tmp_dir.name))
+        self.config.threads = 2
+        self.products = [self.make_product(1, 3), self.make_product(2, 2), self.make_product(3, 2)]
+        for name, kwargs in [
+            ("token", {}),
+            ("customer_products", {"side_effect": lambda: iter(self.products)}),
+            ("prepare_download_url", {"return_value": self.download_url}),
+        ]:
+            patcher = mock.patch.object(drpg.sync.DrpgApi, name, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def make_product(order_product_id, files):
+        return Product(
+            productId=f"product-{order_product_id}",
+            publisher=Publisher(name="Test Publishing"),
+            name=f"Test rule book {order_product_id}",
+            orderProductId=order_product_id,
+            fileLastModified="2024-06-01T00:00:00+00:00",
+            files=[
+                DownloadItem(index=index, filename=f"file-{index}.pdf", checksums=[])
+                for index in range(files)
+            ],
+        )
+
+    def file_keys(self):
+        db_conn = sqlite3.connect(self.config.db_path)
+        try:
+            return db_conn.execute(
+                "SELECT product_id, item_id FROM files ORDER BY product_id, item_id"
+            ).fetchall()
+        finally:
+            db_conn.close()
+
+    def expected_keys(self):
+        return [
+            (product["orderProductId"], item["index"])
+            for product in self.products
+            for item in product["files"]
+        ]
+
+    def sync(self):
+        sync = DrpgSync(self.config)
+        sync.sync()
+        return sync
+
+    @tmp_respx_mock()
+    def test_second_sync_downloads_nothing(self, respx_mock):
+        route = respx_mock.get(self.download_url["url"]).respond(200, content=b"content")
+
+        self.sync()
+        self.assertEqual(route.call_count, 7)
+        self.assertEqual(self.file_keys(), self.expected_keys())
+
+        self.sync()
+        self.assertEqual(route.call_count, 7)
+
+    @tmp_respx_mock()
+    def test_removed_product_is_cleaned_up(self, respx_mock):
+        respx_mock.get(self.download_url["url"]).respond(200, content=b"content")
+        self.sync()
+
+        del self.products[1]
+        self.sync()
+
+        self.assertEqual(self.file_keys(), self.expected_keys())
+        self.assertNotIn(2, {product_id for product_id, _ in self.file_keys()})
+
+    @mock.patch.object(DrpgSync, "_FILE_ROWS_BATCH_SIZE", 1)
+    @tmp_respx_mock()
+    def test_rows_saved_in_batches(self, respx_mock):
+        respx_mock.get(self.download_url["url"]).respond(200, content=b"content")
+
+        with mock.patch.object(
+            DrpgSync, "_save_file_rows", autospec=True, side_effect=DrpgSync._save_file_rows
+        ) as save_file_rows:
+            self.sync()
+
+        # At least once while downloading and once at the end, how often depends on timing
+        self.assertGreaterEqual(save_file_rows.call_count, 2)
+        self.assertEqual(self.file_keys(), self.expected_keys())
+
+    @mock.patch.object(DrpgSync, "_PREFETCH_BATCH_SIZE", 3)
+    @tmp_respx_mock()
+    def test_prefetch_in_batches(self, respx_mock):
+        route = respx_mock.get(self.download_url["url"]).respond(200, content=b"content")
+        self.sync()
+
+        sync = self.sync()
+
+        self.assertEqual(route.call_count, 7)
+        self.assertEqual(
+            sorted(map(drpg.sync._split_item_key, sync._db_cache)), self.expected_keys()
+        )
+
+    def test_interrupt_cancels_queued_downloads(self):
+        self.config.threads = 1
+        started = []
+        cancelled = threading.Event()
+
+        class Executor(ThreadPoolExecutor):
+            def shutdown(self, wait=True, *, cancel_futures=False):
+                super().shutdown(wait, cancel_futures=cancel_futures)
+                if cancel_futures:
+                    cancelled.set()
+
+        def process_item(sync, product, item):
+            started.append((product["orderProductId"], item["index"]))
+            if len(started) == 1:
+                sync._queue_file_row(product, item, sync._file_path(product, item), None, None)
+            else:
+                # Still running when Ctrl+C is pressed
+                self.assertTrue(cancelled.wait(5))
+
+        def interrupted(futures):
+            # Ctrl+C while waiting for the second download
+            yield next(as_completed(futures))
+            raise KeyboardInterrupt
+
+        with mock.patch("drpg.sync.ThreadPoolExecutor", Executor), mock.patch(
+            "drpg.sync.as_completed", interrupted
+        ), mock.patch.object(
+            DrpgSync, "_process_item_db", autospec=True, side_effect=process_item
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                self.sync()
+
+        self.assertEqual(started, [(1, 0), (1, 1)])
+        self.assertEqual(self.file_keys(), [(1, 0)])
+
+
+class CompatibleCharactersTest(TestCase):
+    def test_matches_regex(self):
+        """The translate table must keep behaving like the regex it replaced."""
+        old_pattern = re.compile(r"[^a-zA-Z0-9.\s]")
+        table = drpg.sync._CompatibleCharacters()
+        text = "".join(map(chr, range(0x3000)))
+        self.assertEqual(text.translate(table), old_pattern.sub("_", text))
+
+
+class NewestChecksumTest(TestCase):
+    def test_newest_by_date(self):
+        item = {
+            "checksums": [
+                {"checksum": "middle", "checksumDate": "2023-06-01T00:00:00+00:00"},
+                {"checksum": "newest", "checksumDate": "2024-01-01T00:00:00+00:00"},
+                {"checksum": "oldest", "checksumDate": "2020-12-31T23:59:59+00:00"},
+            ]
+        }
+        self.assertEqual(drpg.sync._newest_checksum(item), "newest")
+
+    def test_no_checksums(self):
+        self.assertIsNone(drpg.sync._newest_checksum({"checksums": None}))
+
+
+class ItemKeyTest(TestCase):
+    def test_round_trip(self):
+        for product_id, item_id in [(0, 0), (1, 0), (0, 1), (123456789, 42), (2**40, 2**32 - 1)]:
+            with self.subTest(product_id=product_id, item_id=item_id):
+                key = drpg.sync._item_key(product_id, item_id)
+                self.assertEqual(drpg.sync._split_item_key(key), (product_id, item_id))
+
+    def test_unique(self):
+        keys = {drpg.sync._item_key(p, i) for p in range(50) for i in range(50)}
+        self.assertEqual(len(keys), 2500)
+
+
+class DrpgSyncCloseDbTest(TestCase):
+    @mock.patch("drpg.sync.logger")
+    def test_optimize_error(self, logger):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            sync = DrpgSync(make_config(Path(tmp_dir)))
+            db_conn = mock.Mock(wraps=sync._db_conn)
+            db_conn.execute.side_effect = sqlite3.OperationalError("database is locked")
+            sync._db_conn = db_conn
+
+            sync._close_db()
+
+            db_conn.close.assert_called_once()
+            self.assertIsNone(sync._db_conn)
+            logger.debug.assert_any_call(
+                "Could not optimize the database: %s", db_conn.execute.side_effect
+            )
+
+    def test_failed_init(self):
+        sync = DrpgSync.__new__(DrpgSync)
+        sync._close_db()
@@ -0,0 +1,96 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import TestCase, mock
+
+from drpg import tui
+
+
+class ConfigFileTest(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = Path(tmp_dir.name)
+        self.config_file = self.tmp_dir / "config.json"
+        for name, value in [
+            ("CONFIG_FILE", self.config_file),
+            ("_CONFIG_CACHE", None),
+            ("_PENDING_CONFIG", None),
+            ("_LAST_CONFIG_DIGEST", None),
+        ]:
+            patcher = mock.patch.object(tui, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def config(self, **kwargs):
+        return {**tui.DEFAULT_CONFIG, **kwargs}
+
+    def test_save_is_written_on_flush(self):
+        tui.save_config(self.config(threads=2))
+        tui.save_config(self.config(threads=3))
+        self.assertFalse(self.config_file.exists())
+        self.assertEqual(tui.load_config()["threads"], 3)
+
+        with mock.patch("drpg.tui._write_file", wraps=tui._write_file) as write_file:
+            tui.flush_config()
+            tui.flush_config()
+
+        write_file.assert_called_once()
+        self.assertEqual(json.loads(self.config_file.read_bytes())["threads"], 3)
+
+    def test_unchanged_config_is_not_rewritten(self):
+        tui.save_config(self.config(threads=2))
+        tui.flush_config()
+
+        with mock.patch("drpg.tui._write_file") as write_file:
+            tui.save_config(self.config(threads=2))
+            tui.flush_config()
+        write_file.assert_not_called()
+
+        with mock.patch("drpg.tui._write_file") as write_file:
+            tui.save_config(self.config(threads=4))
+            tui.flush_config()
+        write_file.assert_called_once()
+
+    def test_unchanged_config_from_disk_is_not_rewritten(self):
+        tui.save_config(self.config(threads=2))
+        tui.flush_config()
+        tui._CONFIG_CACHE = None
+        tui._LAST_CONFIG_DIGEST = None
+
+        config = tui.load_config()
+        with mock.patch("drpg.tui._write_file") as write_file:
+            tui.save_config(dict(config))
+            tui.flush_config()
+        write_file.assert_not_called()
+
+    def test_paths_are_saved_as_strings(self):
+        library_path = self.tmp_dir / "library"
+        tui.save_config(self.config(library_path=library_path))
+        tui.flush_config()
+        self.assertEqual(
+            json.loads(self.config_file.read_bytes())["library_path"], str(library_path)
+        )
+
+    @unittest.skipIf(sys.platform == "win32", "POSIX permissions")
+    def test_config_file_is_private(self):
+        tui.save_config(self.config(api_token="secret"))
+        tui.flush_config()
+        self.assertEqual(stat.S_IMODE(self.config_file.stat().st_mode), 0o600)
+
+    def test_write_file_replaces_atomically(self):
+        self.config_file.write_bytes(b"old")
+
+        with mock.patch("os.write", side_effect=OSError("No space left on device")):
+            with self.assertRaises(OSError):
+                tui._write_file(self.config_file, b"new")
+        self.assertEqual(self.config_file.read_bytes(), b"old")
+        self.assertEqual(os.listdir(self.tmp_dir), [self.config_file.name])
+
+        tui._write_file(self.config_file, b"new")
+        self.assertEqual(self.config_file.read_bytes(), b"new")
+        self.assertEqual(os.listdir(self.tmp_dir), [self.config_file.name])